@@ -1,25 +1,73 @@
 """
 Cache module for Hercule.
-Handles in-memory caching with JSON file persistence.
+Handles in-memory caching with an append-only MessagePack log for persistence.
 """
-import json
+import os
+import mmap
+import time
+import struct
 import hashlib
+from functools import partial
 from pathlib import Path
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+from typing import Optional, Dict, Any, BinaryIO
 from threading import Lock
 
+import msgspec
+
+try:
+    import xxhash
+    _new_hasher = xxhash.xxh3_64
+    _KEY_SCHEME = b'X'
+except ImportError:
+    # Standard-library fallback with the same 16-hex-char key width. The key has
+    # no security role; saying so keeps FIPS-restricted OpenSSL builds happy.
+    _new_hasher = partial(hashlib.blake2b, digest_size=8, usedforsecurity=False)
+    _KEY_SCHEME = b'B'
+
 from models import AnalysisResult
 
 # Cache configuration
-CACHE_FILE = Path(__file__).parent / "cache.json"
+CACHE_FILE = Path(__file__).parent / "cache.log"
+LEGACY_CACHE_FILE = Path(__file__).parent / "cache.json"
+# Bump whenever the key scheme or record layout changes; older logs are discarded
+CACHE_VERSION = 2
 CACHE_TTL_DAYS = 30
+CACHE_TTL_SECONDS = CACHE_TTL_DAYS * 86400
+HASH_CHUNK_CHARS = 64 * 1024
+CACHE_MAX_ENTRIES = 10_000
+
+# Log durability / compaction tuning
+FSYNC_EVERY_WRITES = 16
+FSYNC_INTERVAL_SECONDS = 5.0
+COMPACT_MIN_RECORDS = 64
+COMPACT_RATIO = 2
+
+# Reusable MessagePack codecs (construction is not free, so build them once)
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(dict)
+
+# The log opens with a magic tag, the key scheme and CACHE_VERSION. Caches written
+# under another scheme or version (e.g. SHA-256 keys) can never hit, so they are
+# dropped instead of replayed.
+_LOG_HEADER = struct.pack('>3scH', b'HRC', _KEY_SCHEME, CACHE_VERSION)
+
+# Each log record is a 4-byte big-endian length followed by a MessagePack map
+# {"k": text_hash, "v": entry}. Deletions are never logged: they compact the log.
+_frame_header = struct.Struct('>I')
+
+
+def _is_entry(entry: Any) -> bool:
+    """Whether a replayed log value has the shape set_memory() writes."""
+    return (isinstance(entry, dict)
+            and isinstance(entry.get("result_json"), str)
+            and isinstance(entry.get("expires_at"), (int, float)))
 
 
 class CacheManager:
     """
-    Thread-safe cache manager with in-memory caching and JSON file persistence.
-    Uses SHA-256 hash of normalized policy text as cache key.
+    Thread-safe cache manager with in-memory caching and append-only log persistence.
+    Uses a 64-bit hash (XXH3, or BLAKE2b without xxhash) of normalized policy text as cache key.
     """
 
     _instance: Optional['CacheManager'] = None
@@ -39,103 +87,328 @@ class CacheManager:
         if self._initialized:
             return
 
-        self._memory_cache: Dict[str, Dict[str, Any]] = {}
+        # Readers never lock: a single dict lookup is atomic under the GIL.
+        # Writers serialize on _write_lock; bulk replacement publishes a new dict.
+        # Entries are kept in least- to most-recently-used order for LRU eviction.
+        self._memory_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._write_lock = Lock()
         self._file_lock = Lock()
+        self._log: Optional[BinaryIO] = None
+        self._log_records = 0
+        self._unsynced_writes = 0
+        self._last_sync = time.monotonic()
         self._load_from_file()
+        if self._log is None:
+            self._open_log()
         self._initialized = True
 
+    def _open_log(self) -> None:
+        """Open the cache log for appending."""
+        try:
+            self._log = open(CACHE_FILE, 'ab')
+            if self._log.tell() == 0:
+                self._log.write(_LOG_HEADER)
+                self._log.flush()
+        except IOError as e:
+            print(f"Error opening cache file: {e}")
+            self._log = None
+
     def _load_from_file(self) -> None:
-        """Load cache from JSON file into memory."""
+        """Replay the cache log into memory."""
+        self._memory_cache = OrderedDict()
         if not CACHE_FILE.exists():
-            self._memory_cache = {}
+            if LEGACY_CACHE_FILE.exists():
+                # The JSON cache predates CACHE_VERSION; its SHA-256 keys never match
+                print("Discarding legacy cache file written by an older version")
+                LEGACY_CACHE_FILE.unlink(missing_ok=True)
             return
 
         try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                self._memory_cache = json.load(f)
-        except json.JSONDecodeError as e:
-            print(f"Cache file corrupted, resetting: {e}")
-            self._memory_cache = {}
-        except IOError as e:
+            with open(CACHE_FILE, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return
+                # Map the log instead of reading it so pages are faulted in on
+                # demand and records are decoded straight from the mapping
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    current = mm[:len(_LOG_HEADER)] == _LOG_HEADER
+                    if current:
+                        with memoryview(mm) as view, view[len(_LOG_HEADER):] as records:
+                            offset = len(_LOG_HEADER) + self._replay(records)
+        except (IOError, ValueError) as e:
             print(f"Error reading cache file: {e}")
-            self._memory_cache = {}
+            return
 
-    def _save_to_file(self) -> None:
-        """Persist in-memory cache to JSON file."""
+        if not current:
+            print("Discarding cache log written by another cache version")
+            CACHE_FILE.unlink(missing_ok=True)
+            return
+
+        if offset < size:
+            # Drop a torn or corrupted tail so new records are appended after valid data
+            with open(CACHE_FILE, 'r+b') as f:
+                f.truncate(offset)
+
+    def _replay(self, view: memoryview) -> int:
+        """
+        Apply every complete record in the log buffer to the in-memory cache.
+
+        Args:
+            view: The raw contents of the cache log
+
+        Returns:
+            Offset just past the last valid record
+        """
+        offset = 0
+        records = 0
+        while offset + _frame_header.size <= len(view):
+            (length,) = _frame_header.unpack_from(view, offset)
+            end = offset + _frame_header.size + length
+            if end > len(view):
+                break
+            try:
+                record = _decoder.decode(view[offset + _frame_header.size:end])
+            except msgspec.DecodeError as e:
+                print(f"Cache log corrupted at byte {offset}, ignoring the rest: {e}")
+                break
+            text_hash = record.get("k")
+            entry = record.get("v")
+            if not isinstance(text_hash, str) or not _is_entry(entry):
+                # Valid MessagePack but not one of our records: treat it as a torn tail
+                print(f"Cache log record at byte {offset} is malformed, ignoring the rest")
+                break
+            self._memory_cache[text_hash] = entry
+            self._memory_cache.move_to_end(text_hash)
+            records += 1
+            offset = end
+
+        self._log_records = records
+        self._trim()
+        return offset
+
+    @staticmethod
+    def _frame(text_hash: str, entry: Dict[str, Any]) -> bytes:
+        """Encode a single length-prefixed log record."""
+        buf = _encoder.encode({"k": text_hash, "v": entry})
+        return _frame_header.pack(len(buf)) + buf
+
+    def _append(self, text_hash: str, entry: Dict[str, Any]) -> None:
+        """Append one record to the cache log."""
+        record = self._frame(text_hash, entry)
+        sync_fd = None
         with self._file_lock:
+            if self._log is None:
+                return
             try:
-                with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(self._memory_cache, f, indent=2, default=str)
+                self._log.write(record)
+                self._log.flush()
+                self._log_records += 1
+                self._unsynced_writes += 1
+                if (self._unsynced_writes >= FSYNC_EVERY_WRITES
+                        or time.monotonic() - self._last_sync >= FSYNC_INTERVAL_SECONDS):
+                    # fsync a duplicate descriptor after releasing the lock so other
+                    # writers are not stalled behind the disk flush
+                    sync_fd = os.dup(self._log.fileno())
+                    self._unsynced_writes = 0
+                    self._last_sync = time.monotonic()
             except IOError as e:
-                print(f"Error saving cache file: {e}")
+                print(f"Error writing cache file: {e}")
+
+        if sync_fd is not None:
+            try:
+                os.fsync(sync_fd)
+            except OSError as e:
+                print(f"Error syncing cache file: {e}")
+            finally:
+                os.close(sync_fd)
+
+        if self._log_records > max(COMPACT_MIN_RECORDS, COMPACT_RATIO * len(self._memory_cache)):
+            self.compact()
+
+    def _sync(self) -> None:
+        """fsync the log. Caller must hold the file lock."""
+        os.fsync(self._log.fileno())
+        self._unsynced_writes = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self) -> None:
+        """Rewrite the log so it only contains live entries."""
+        with self._file_lock:
+            tmp_file = CACHE_FILE.with_name(CACHE_FILE.name + ".tmp")
+            entries = list(self._memory_cache.items())
+            try:
+                with open(tmp_file, 'wb') as f:
+                    f.write(_LOG_HEADER)
+                    for text_hash, entry in entries:
+                        f.write(self._frame(text_hash, entry))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._log is not None:
+                    self._log.close()
+                os.replace(tmp_file, CACHE_FILE)
+                self._log_records = len(entries)
+                self._unsynced_writes = 0
+                self._last_sync = time.monotonic()
+            except IOError as e:
+                print(f"Error compacting cache file: {e}")
+            finally:
+                if self._log is None or self._log.closed:
+                    self._open_log()
+
+    def close(self) -> None:
+        """Flush pending writes and close the cache log."""
+        with self._file_lock:
+            if self._log is None or self._log.closed:
+                return
+            try:
+                self._log.flush()
+                self._sync()
+            except IOError as e:
+                print(f"Error syncing cache file: {e}")
+            self._log.close()
+            # Later appends are dropped instead of hitting a closed file
+            self._log = None
 
     @staticmethod
     def generate_key(policy_text: str) -> str:
         """
-        Generate SHA-256 hash of normalized policy text.
+        Generate a 64-bit hash of normalized policy text.
+
+        The key is only used to look up local cache entries, so a fast
+        non-cryptographic hash is sufficient: XXH3-64 when xxhash is
+        installed, otherwise BLAKE2b with an 8-byte digest.
 
         Args:
             policy_text: The privacy policy text
 
         Returns:
-            SHA-256 hash as hexadecimal string
+            16-character hexadecimal hash string
         """
-        normalized = policy_text.strip().lower()
-        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+        # Find the strip() bounds without copying the text
+        start, end = 0, len(policy_text)
+        while start < end and policy_text[start].isspace():
+            start += 1
+        while end > start and policy_text[end - 1].isspace():
+            end -= 1
+
+        # Lowercase the stripped span in one go: str.lower() is context-sensitive
+        # (a final capital sigma becomes "ς"), so a chunk boundary would change it
+        normalized = policy_text[start:end].lower()
+
+        hasher = _new_hasher()
+        # Encode one block at a time so no full-size bytes copy is built
+        for i in range(0, len(normalized), HASH_CHUNK_CHARS):
+            hasher.update(normalized[i:i + HASH_CHUNK_CHARS].encode('utf-8'))
+        return hasher.hexdigest()
 
     def get(self, text_hash: str) -> Optional[AnalysisResult]:
         """
         Retrieve cached analysis result if it exists and is valid.
 
         Args:
-            text_hash: SHA-256 hash of the policy text
+            text_hash: Cache key from generate_key()
 
         Returns:
             AnalysisResult if cache hit and valid, None otherwise
         """
-        if text_hash not in self._memory_cache:
+        cached_entry = self._memory_cache.get(text_hash)
+        if cached_entry is None:
             return None
 
-        cached_entry = self._memory_cache[text_hash]
+        # Expired entries are left for evict_expired() to remove
+        if time.time() > cached_entry["expires_at"]:
+            return None
 
-        # Check if cache is still valid (within TTL)
         try:
-            cached_timestamp = datetime.fromisoformat(cached_entry["timestamp"])
-            if datetime.now(timezone.utc) - cached_timestamp > timedelta(days=CACHE_TTL_DAYS):
-                # Expired - remove from cache
-                del self._memory_cache[text_hash]
-                self._save_to_file()
-                return None
-        except (KeyError, ValueError) as e:
-            print(f"Invalid cache entry timestamp: {e}")
-            return None
+            self._memory_cache.move_to_end(text_hash)
+        except KeyError:
+            # Evicted by a concurrent writer; the entry we already hold is still valid
+            pass
 
-        # Convert cached result to AnalysisResult model
+        # Parse the stored JSON straight into the model (no intermediate dict)
         try:
-            return AnalysisResult(**cached_entry["result"])
+            return AnalysisResult.model_validate_json(cached_entry["result_json"])
         except (KeyError, ValueError) as e:
             print(f"Error parsing cached result: {e}")
             return None
 
     def set(self, text_hash: str, result: AnalysisResult) -> None:
         """
-        Store analysis result in cache.
+        Store analysis result in cache and persist it.
+
+        Args:
+            text_hash: Cache key from generate_key()
+            result: AnalysisResult to cache
+        """
+        self.set_memory(text_hash, result)
+        self.persist(text_hash)
+
+    def set_memory(self, text_hash: str, result: AnalysisResult) -> None:
+        """
+        Store analysis result in the in-memory cache only.
+
+        Cheap enough to call on the event loop; pair with persist() to write it to disk.
 
         Args:
-            text_hash: SHA-256 hash of the policy text
+            text_hash: Cache key from generate_key()
             result: AnalysisResult to cache
         """
-        self._memory_cache[text_hash] = {
-            "result": result.model_dump(mode='json'),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "text_hash": text_hash
+        entry = {
+            "result_json": result.model_dump_json(),
+            "expires_at": time.time() + CACHE_TTL_SECONDS
         }
-        self._save_to_file()
+        with self._write_lock:
+            self._memory_cache[text_hash] = entry
+            self._memory_cache.move_to_end(text_hash)
+            self._trim()
+
+    def _trim(self) -> None:
+        """Evict least-recently-used entries beyond CACHE_MAX_ENTRIES."""
+        while len(self._memory_cache) > CACHE_MAX_ENTRIES:
+            self._memory_cache.popitem(last=False)
+
+    def persist(self, text_hash: str) -> None:
+        """
+        Append the current in-memory entry for text_hash to the cache log.
+
+        Performs blocking file I/O; run it off the event loop.
+
+        Args:
+            text_hash: Cache key from generate_key()
+        """
+        entry = self._memory_cache.get(text_hash)
+        if entry is not None:
+            self._append(text_hash, entry)
+
+    def evict_expired(self) -> int:
+        """
+        Remove all expired entries and compact the log once.
+
+        Returns:
+            Number of entries removed
+        """
+        now = time.time()
+        expired = [k for k, v in list(self._memory_cache.items()) if now > v["expires_at"]]
+        if not expired:
+            return 0
+
+        removed = 0
+        with self._write_lock:
+            for text_hash in expired:
+                # set() may have refreshed the entry since the scan above
+                entry = self._memory_cache.get(text_hash)
+                if entry is not None and now > entry["expires_at"]:
+                    del self._memory_cache[text_hash]
+                    removed += 1
+        if removed:
+            self.compact()
+        return removed
 
     def clear(self) -> None:
         """Clear all cached entries."""
-        self._memory_cache = {}
-        self._save_to_file()
+        with self._write_lock:
+            self._memory_cache = OrderedDict()
+        self.compact()
 
     def size(self) -> int:
         """Return number of cached entries."""
@@ -0,0 +1,61 @@
+"""
+Shared pytest fixtures for the backend test suite.
+"""
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _uvloop():
+    """Run every event loop the tests create (TestClient, asyncio.run) on uvloop when available."""
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop does not support Windows; fall back to the stdlib loop
+        yield
+        return
+    previous = asyncio.get_event_loop_policy()
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    yield
+    asyncio.set_event_loop_policy(previous)
+
+
+@pytest.fixture(autouse=True)
+def app_cache(tmp_path, monkeypatch):
+    """Give the app a fresh cache logged under tmp_path so tests never touch backend/cache.log."""
+    import cache
+    import main
+    monkeypatch.setattr(cache, "CACHE_FILE", tmp_path / "cache.log")
+    monkeypatch.setattr(cache, "LEGACY_CACHE_FILE", tmp_path / "cache.json")
+    previous = cache.CacheManager._instance
+    cache.CacheManager._instance = None
+    manager = cache.CacheManager()
+    monkeypatch.setattr(main, "cache_manager", manager)
+    yield manager
+    manager.close()
+    cache.CacheManager._instance = previous
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The FastAPI application, imported once per test session."""
+    from main import app
+    return app
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    """Test client shared by every API test in a module; the app lifespan runs once."""
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def llm_service():
+    """A single mock-mode LLMService shared by tests that do not reconfigure it."""
+    from service_llm import LLMService
+    service = LLMService()
+    service.test_mode = True
+    return service
@@ -3,14 +3,18 @@ Hercule API
 FastAPI backend for analyzing privacy policies using Azure OpenAI.
 """
 import os
+import asyncio
 import logging
 import time
-from datetime import datetime, timezone
-from typing import List
+from contextlib import asynccontextmanager, suppress
+from functools import partial
+from typing import Dict, Optional, Set
 
-from fastapi import FastAPI, HTTPException, Request
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, field_validator
+from selectolax.lexbor import LexborHTMLParser
 from dotenv import load_dotenv
 
 from models import AnalysisResult
@@ -30,8 +34,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger("hercule-api")
 
+# How often expired cache entries are evicted
+CACHE_SWEEP_INTERVAL_SECONDS = 15 * 60
+
+# Upper bounds on per-request input so pathological payloads cannot exhaust CPU/memory
+MAX_POLICY_CHARS = 500_000
+MAX_FETCH_BYTES = 2 * 1024 * 1024
+
+# Shared HTTP client for fetching policy pages (connection pooling + keep-alive),
+# opened and closed by the app lifespan
+FETCH_TIMEOUT_SECONDS = 10
+http_client: Optional[httpx.AsyncClient] = None
+
+# Analyses currently waiting on the LLM, keyed by cache key, so concurrent
+# requests for the same policy share one LLM call. Each runs as its own task so
+# a cancelled request cannot take the result away from the others waiting on it.
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _run_in_background(coro) -> None:
+    """Schedule a coroutine without awaiting it."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _ttl_sweeper():
+    """Periodically evict expired cache entries so the request path never has to."""
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await asyncio.to_thread(cache_manager.evict_expired)
+            if removed:
+                logger.info(f"🧹 Evicted {removed} expired cache entries")
+        except Exception as e:
+            logger.error(f"Cache sweep failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared resources and start background tasks on startup; release them on shutdown."""
+    global http_client
+    http_client = httpx.AsyncClient(
+        headers={'User-Agent': 'Mozilla/5.0'},
+        timeout=FETCH_TIMEOUT_SECONDS,
+        follow_redirects=True,
+        limits=httpx.Limits(max_keepalive_connections=20),
+    )
+    sweeper = asyncio.create_task(_ttl_sweeper())
+    yield
+    sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    await http_client.aclose()
+    # Flush and fsync appends made since the last periodic sync
+    cache_manager.close()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Hercule API")
+app = FastAPI(title="Hercule API", lifespan=lifespan)
 
 # CORS configuration - restrict in production
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -49,6 +113,32 @@ llm_service = LLMService()
 discovery_service = DiscoveryService()
 
 
+def get_llm_service() -> LLMService:
+    """Dependency returning the shared LLM service (overridable in tests)."""
+    return llm_service
+
+
+# Health fields that cannot change after startup
+_HEALTH_STATIC = {
+    "status": "healthy",
+    "test_mode": llm_service.test_mode,
+    "provider": llm_service.provider,
+    "dev_mode": getattr(llm_service, 'dev_mode', False),
+}
+
+# (epoch second, ISO 8601 string) of the last formatted timestamp
+_iso_now_cache = (0, "")
+
+
+def _fast_iso_now() -> str:
+    """Current UTC time in ISO 8601, formatted at most once per second."""
+    global _iso_now_cache
+    now = int(time.time())
+    if _iso_now_cache[0] != now:
+        _iso_now_cache = (now, time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(now)))
+    return _iso_now_cache[1]
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Middleware to log all incoming requests."""
@@ -69,6 +159,10 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# Deletes NUL characters in a single C-level pass
+_NULL_TABLE = str.maketrans('', '', '\x00')
+
+
 class AnalyzeRequest(BaseModel):
     """Request model for /analyze endpoint with validation."""
     policy_text: str
@@ -81,12 +175,16 @@ class AnalyzeRequest(BaseModel):
         # Note: We can't easily access other fields in field_validator in v2 without model_validator
         # But we can allow empty here and check model consistency later or just allow empty strings
         # and handle in the endpoint.
-        if v and not v.strip():
+        if v and v.isspace():
              # If provided but whitespace
-             return v.strip()
+             return ""
         # Basic sanitization
         if v:
-            return v.replace('\x00', '')
+            if len(v) > MAX_POLICY_CHARS:
+                v = v[:MAX_POLICY_CHARS]
+            if '\x00' in v:
+                v = v.translate(_NULL_TABLE)
+            return v
         return v or ""
 
     @field_validator('url')
@@ -95,10 +193,31 @@ class AnalyzeRequest(BaseModel):
         """Basic URL sanitization."""
         if v:
             # Remove null bytes and trim
-            return v.replace('\x00', '').strip()
+            if '\x00' in v:
+                v = v.translate(_NULL_TABLE)
+            return v.strip()
         return v
 
 
+async def _read_capped(resp: httpx.Response, limit: int) -> str:
+    """Read at most `limit` bytes of a streamed response body and decode it."""
+    body = bytearray()
+    async for chunk in resp.aiter_bytes():
+        body += chunk
+        if len(body) >= limit:
+            break
+    return body[:limit].decode(resp.encoding or 'utf-8', errors='replace')
+
+
+def _extract_text(html: str) -> str:
+    """Extract visible text from an HTML page, skipping scripts and styles."""
+    tree = LexborHTMLParser(html)
+    for node in tree.css('script, style'):
+        node.decompose()
+    root = tree.body or tree.root
+    return root.text(separator=' ', strip=True) if root is not None else ""
+
+
 class HealthResponse(BaseModel):
     """Response model for health check."""
     status: str
@@ -117,7 +236,7 @@ async def discover_policy(url: str):
     if not url:
         raise HTTPException(status_code=400, detail="URL is required")
     
-    policy_url = discovery_service.find_policy(url)
+    policy_url = await discovery_service.find_policy_async(url)
     if not policy_url:
         raise HTTPException(status_code=404, detail="Privacy policy not found")
         
@@ -127,23 +246,17 @@ async def discover_policy(url: str):
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint with cache and service status."""
-    return HealthResponse(
-        status="healthy",
-        timestamp=datetime.now(timezone.utc).isoformat(),
-        cache_size=cache_manager.size(),
-        test_mode=llm_service.test_mode,
-        provider=llm_service.provider,
-        dev_mode=getattr(llm_service, 'dev_mode', False)
-    )
+    return {**_HEALTH_STATIC, "timestamp": _fast_iso_now(), "cache_size": cache_manager.size()}
 
 
 @app.post("/analyze", response_model=AnalysisResult)
-async def analyze_policy(request: AnalyzeRequest):
+async def analyze_policy(request: AnalyzeRequest, service: LLMService = Depends(get_llm_service)):
     """
     Analyze a privacy policy and return structured insights.
 
     Args:
         request: AnalyzeRequest containing policy_text and optional url
+        service: LLM service used on a cache miss
 
     Returns:
         AnalysisResult with score, summary, red flags, and action items
@@ -155,19 +268,13 @@ async def analyze_policy(request: AnalyzeRequest):
     if not request.policy_text and request.url:
         logger.info(f"🌐 Fetching policy content from: {request.url}")
         try:
-             # Basic fetch
-             import requests
-             resp = requests.get(request.url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
-             if resp.status_code == 200:
-                 # Extract text using BeautifulSoup
-                 from bs4 import BeautifulSoup
-                 soup = BeautifulSoup(resp.text, 'html.parser')
-                 # Remove script and style elements
-                 for script in soup(["script", "style"]):
-                     script.decompose()
-                 request.policy_text = soup.get_text(separator=' ', strip=True)
-             else:
-                 raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {resp.status_code}")
+             # Basic fetch, streamed so oversized pages are cut off early
+             async with http_client.stream("GET", request.url) as resp:
+                 if resp.status_code == 200:
+                     html = await _read_capped(resp, MAX_FETCH_BYTES)
+                     request.policy_text = _extract_text(html)[:MAX_POLICY_CHARS]
+                 else:
+                     raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {resp.status_code}")
         except Exception as e:
             logger.error(f"Error fetching URL: {e}")
             raise HTTPException(status_code=400, detail=f"Error fetching URL: {str(e)}")
@@ -188,12 +295,52 @@ async def analyze_policy(request: AnalyzeRequest):
         logger.info(f"💾 Cache HIT - returning cached result (score: {cached_result.score})")
         return cached_result
 
-    logger.info(f"🔍 Cache MISS - calling {llm_service.provider.upper()} LLM...")
+    # Another request is already analyzing this exact policy: wait for its result
+    task = _inflight.get(text_hash)
+    if task is not None:
+        logger.info(f"⏳ Joining in-flight analysis (hash: {text_hash[:12]}...)")
+    else:
+        task = asyncio.create_task(_analyze_and_cache(service, request.policy_text, request.url, text_hash))
+        _inflight[text_hash] = task
+        task.add_done_callback(partial(_forget_inflight, text_hash))
+
+    # Shielded so a disconnecting client only abandons its own wait
+    return await asyncio.shield(task)
+
+
+def _forget_inflight(text_hash: str, task: asyncio.Task) -> None:
+    """Drop a finished analysis from the in-flight table."""
+    if _inflight.get(text_hash) is task:
+        del _inflight[text_hash]
+    if not task.cancelled():
+        # Mark any exception as retrieved in case every waiter went away
+        task.exception()
+
+
+async def _analyze_and_cache(service: LLMService, policy_text: str, url: str, text_hash: str) -> AnalysisResult:
+    """Run one analysis and cache its result, independently of the requests waiting on it."""
+    result = await _run_analysis(service, policy_text, url)
+
+    # Store result in cache; the disk write happens on a worker thread
+    cache_manager.set_memory(text_hash, result)
+    _run_in_background(asyncio.to_thread(cache_manager.persist, text_hash))
+    logger.debug(f"💾 Result cached (cache size: {cache_manager.size()})")
+
+    return result
+
+
+async def _run_analysis(service: LLMService, policy_text: str, url: str) -> AnalysisResult:
+    """
+    Await the LLM service and map its errors to HTTP errors.
+
+    Raises:
+        HTTPException: 400 on validation errors, 503 if the LLM is unreachable, 500 otherwise
+    """
+    logger.info(f"🔍 Cache MISS - calling {service.provider.upper()} LLM...")
 
-    # Cache miss - call LLM service
     start_time = time.time()
     try:
-        result = llm_service.analyze_policy(request.policy_text, request.url)
+        result = await service.analyze_policy_async(policy_text, url)
         duration_ms = (time.time() - start_time) * 1000
         logger.info(f"✨ Analysis complete - Score: {result.score}/100, Red flags: {len(result.red_flags)}, Duration: {duration_ms:.0f}ms")
     except ValueError as e:
@@ -209,10 +356,6 @@ async def analyze_policy(request: AnalyzeRequest):
             detail=f"Failed to analyze policy: {type(e).__name__}"
         )
 
-    # Store result in cache
-    cache_manager.set(text_hash, result)
-    logger.debug(f"💾 Result cached (cache size: {cache_manager.size()})")
-
     return result
 
 
@@ -1,12 +1,41 @@
+import asyncio
 import logging
+import re
+import threading
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-from typing import Optional
-from duckduckgo_search import DDGS
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import urljoin, urlparse, parse_qs
+from typing import Optional, Tuple
 
 logger = logging.getLogger("privacy-api")
 
+# Number of resolved policy URLs remembered per process (LRU)
+POLICY_CACHE_SIZE = 1024
+
+# Most homepage bytes read while looking for a policy link
+MAX_HOMEPAGE_BYTES = 512 * 1024
+HOMEPAGE_CHUNK_BYTES = 16 * 1024
+
+# Words that mark a link as a likely policy page
+POLICY_LINK_KEYWORDS = ('privacy', 'terms', 'legal', 'policy', 'tos', 'conditions')
+
+# One case-insensitive pass per string instead of lowercasing and scanning per keyword
+_KEYWORD_RE = re.compile('|'.join(map(re.escape, POLICY_LINK_KEYWORDS)), re.IGNORECASE)
+
+# Discoveries expected to probe paths at the same time. The probe pool holds a
+# full batch of workers for each, so one site's slow or timing-out probes do not
+# delay another's; past this many concurrent discoveries, batches queue.
+MAX_CONCURRENT_DISCOVERIES = 4
+
+# DuckDuckGo's no-JS results page, fetched through the pooled session
+DDG_HTML_URL = "https://html.duckduckgo.com/html/"
+
 class DiscoveryService:
     def __init__(self):
         self.headers = {
@@ -22,7 +51,27 @@ class DiscoveryService:
             '/terms-of-service',
             '/tos'
         ]
-        self.keywords = ['privacy', 'terms', 'legal', 'policy', 'tos', 'conditions']
+
+        # Pooled session so the homepage GET and path probes reuse TCP/TLS connections
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=1, backoff_factor=0.1)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Resolved policy URL per domain, least- to most-recently used
+        self._policy_cache: 'OrderedDict[str, str]' = OrderedDict()
+        self._policy_cache_lock = threading.Lock()
+
+        # Workers for probing common paths concurrently (I/O-bound, GIL released on sockets).
+        # Threads are started on demand, so the headroom costs nothing while idle.
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.common_paths) * MAX_CONCURRENT_DISCOVERIES
+        )
 
     def find_policy(self, url: str) -> Optional[str]:
         """
@@ -32,31 +81,101 @@ class DiscoveryService:
         2. Hackathon Way: Use DuckDuckGo search.
         """
         try:
-            domain = self._get_domain(url)
+            domain, policy_url = self._start_discovery(url)
+            if policy_url:
+                return policy_url
             base_url = f"https://{domain}"
-            
-            logger.info(f"🔍 Starting policy discovery for {domain}")
 
             # Step 1: Soft Discovery
             policy_url = self._soft_discovery(base_url)
             if policy_url:
-                logger.info(f"✅ Found policy via Soft Discovery: {policy_url}")
-                return policy_url
+                return self._found_policy(domain, policy_url, "Soft Discovery")
 
             # Step 2: Hackathon Way (DuckDuckGo)
             policy_url = self._search_ddg(domain)
             if policy_url:
-                logger.info(f"✅ Found policy via DuckDuckGo: {policy_url}")
-                return policy_url
+                return self._found_policy(domain, policy_url, "DuckDuckGo")
 
-            logger.warning(f"❌ Could not find policy for {domain}")
+            return self._policy_not_found(domain)
+
+        except Exception as e:
+            logger.error("Error in discovery service: %s", e)
             return None
 
+    async def find_policy_async(self, url: str) -> Optional[str]:
+        """
+        Async variant of find_policy for callers on an event loop.
+        The DuckDuckGo fallback is started speculatively alongside soft discovery,
+        so a miss costs max(soft, ddg) instead of their sum.
+        """
+        try:
+            domain, policy_url = self._start_discovery(url)
+            if policy_url:
+                return policy_url
+            base_url = f"https://{domain}"
+
+            soft_task = asyncio.create_task(asyncio.to_thread(self._soft_discovery, base_url))
+            ddg_task = asyncio.create_task(asyncio.to_thread(self._search_ddg, domain))
+            try:
+                # Soft discovery wins whenever it finds something
+                policy_url = await soft_task
+                if policy_url:
+                    return self._found_policy(domain, policy_url, "Soft Discovery")
+
+                policy_url = await ddg_task
+                if policy_url:
+                    return self._found_policy(domain, policy_url, "DuckDuckGo")
+            finally:
+                # The worker thread still finishes; its result is simply dropped
+                ddg_task.cancel()
+
+            return self._policy_not_found(domain)
+
         except Exception as e:
-            logger.error(f"Error in discovery service: {e}")
+            logger.error("Error in discovery service: %s", e)
             return None
 
-    def _get_domain(self, url: str) -> str:
+    def _start_discovery(self, url: str) -> Tuple[str, Optional[str]]:
+        """Resolve the domain of url and return it with its cached policy URL, if any."""
+        domain = self._get_domain(url)
+        policy_url = self._get_cached_policy(domain)
+        if policy_url:
+            logger.info("💾 Policy for %s served from cache: %s", domain, policy_url)
+        else:
+            logger.info("🔍 Starting policy discovery for %s", domain)
+        return domain, policy_url
+
+    def _found_policy(self, domain: str, policy_url: str, source: str) -> str:
+        """Log and cache a policy URL found by a discovery step."""
+        logger.info("✅ Found policy via %s: %s", source, policy_url)
+        self._cache_policy(domain, policy_url)
+        return policy_url
+
+    @staticmethod
+    def _policy_not_found(domain: str) -> None:
+        """Log that every discovery step came up empty (misses are not cached)."""
+        logger.warning("❌ Could not find policy for %s", domain)
+        return None
+
+    def _get_cached_policy(self, domain: str) -> Optional[str]:
+        """Return a previously discovered policy URL for domain, if any."""
+        with self._policy_cache_lock:
+            policy_url = self._policy_cache.get(domain)
+            if policy_url is not None:
+                self._policy_cache.move_to_end(domain)
+            return policy_url
+
+    def _cache_policy(self, domain: str, policy_url: str) -> None:
+        """Remember a discovered policy URL, evicting the least recently used domain."""
+        with self._policy_cache_lock:
+            self._policy_cache[domain] = policy_url
+            self._policy_cache.move_to_end(domain)
+            while len(self._policy_cache) > POLICY_CACHE_SIZE:
+                self._policy_cache.popitem(last=False)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _get_domain(url: str) -> str:
         parsed = urlparse(url)
         # Handle cases where url is just "example.com"
         if not parsed.netloc:
@@ -68,47 +187,109 @@ class DiscoveryService:
         try:
             # 1. Scan Homepage
             try:
-                response = requests.get(base_url, headers=self.headers, timeout=5)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Look for links with keywords
-                    for a in soup.find_all('a', href=True):
-                        text = a.get_text().lower()
-                        href = a['href'].lower()
-                        
-                        if any(k in text for k in self.keywords) or any(k in href for k in self.keywords):
-                            full_url = urljoin(base_url, a['href'])
-                            # Basic validation: ensure it's http(s)
-                            if full_url.startswith('http'):
-                                return full_url
+                policy_url = self._scan_homepage(base_url)
+                if policy_url:
+                    return policy_url
             except Exception as e:
-                logger.warning(f"Homepage scan failed: {e}")
-
-            # 2. Check Standard Paths
-            for path in self.common_paths:
-                target_url = urljoin(base_url, path)
-                try:
-                    response = requests.head(target_url, headers=self.headers, timeout=3, allow_redirects=True)
-                    if response.status_code == 200:
-                        return target_url
-                except:
-                    continue
-            
+                logger.warning("Homepage scan failed: %s", e)
+
+            # 2. Check Standard Paths concurrently; results are taken in
+            # common_paths priority order so /privacy beats /tos
+            targets = [urljoin(base_url, path) for path in self.common_paths]
+            futures = [self._executor.submit(self._probe_path, target) for target in targets]
+            try:
+                for future in futures:
+                    policy_url = future.result()
+                    if policy_url:
+                        return policy_url
+            finally:
+                # Drop lower-priority probes that have not started yet
+                for future in futures:
+                    future.cancel()
+
             return None
 
         except Exception as e:
-            logger.error(f"Soft discovery error: {e}")
+            logger.error("Soft discovery error: %s", e)
             return None
 
+    def _scan_homepage(self, base_url: str) -> Optional[str]:
+        """
+        Stream the homepage and return the first link mentioning a keyword.
+        Parsing is incremental, so the download stops at the first match
+        (or after MAX_HOMEPAGE_BYTES) instead of reading the whole page.
+        """
+        response = self.session.get(base_url, timeout=5, stream=True)
+        try:
+            if response.status_code != 200:
+                return None
+
+            # Skip JSON, images, downloads etc. before reading any of the body
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and 'html' not in content_type.lower():
+                logger.info("Homepage is not HTML (%s), skipping link scan", content_type)
+                return None
+
+            parser = etree.HTMLPullParser(events=('end',), tag='a')
+            consumed = 0
+            for chunk in response.iter_content(chunk_size=HOMEPAGE_CHUNK_BYTES):
+                parser.feed(chunk)
+                policy_url = self._match_links(parser, base_url)
+                if policy_url:
+                    return policy_url
+                consumed += len(chunk)
+                if consumed >= MAX_HOMEPAGE_BYTES:
+                    break
+
+            # Flush links still open when the stream ended
+            try:
+                parser.close()
+            except etree.XMLSyntaxError:
+                # Empty or unparseable body
+                return None
+            return self._match_links(parser, base_url)
+        finally:
+            response.close()
+
+    def _match_links(self, parser: 'etree.HTMLPullParser', base_url: str) -> Optional[str]:
+        """Check the <a> elements completed so far for keyword matches."""
+        for _, a in parser.read_events():
+            href = a.get('href')
+            if href:
+                if _KEYWORD_RE.search(href) or _KEYWORD_RE.search(''.join(a.itertext())):
+                    full_url = urljoin(base_url, href)
+                    # Basic validation: ensure it's http(s)
+                    if full_url.startswith('http'):
+                        return full_url
+        return None
+
+    def _probe_path(self, target_url: str) -> Optional[str]:
+        """HEAD a candidate policy URL and return it if it responds with 200."""
+        try:
+            response = self.session.head(target_url, timeout=3, allow_redirects=True)
+        except Exception:
+            return None
+        return target_url if response.status_code == 200 else None
+
     def _search_ddg(self, domain: str) -> Optional[str]:
         """Use DuckDuckGo to find the policy."""
         try:
             query = f"site:{domain} privacy policy"
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, max_results=1))
-                if results:
-                    return results[0]['href']
+            response = self.session.get(DDG_HTML_URL, params={"q": query}, timeout=5)
+            if response.status_code != 200:
+                return None
+
+            result = LexborHTMLParser(response.text).css_first('a.result__a')
+            if result is None:
+                return None
+            href = result.attributes.get('href') or ''
+
+            # Results link through a //duckduckgo.com/l/?uddg=<target> redirect
+            target = parse_qs(urlparse(href).query).get('uddg')
+            if target:
+                href = target[0]
+            if href.startswith('http'):
+                return href
         except Exception as e:
-            logger.error(f"DuckDuckGo search error: {e}")
+            logger.error("DuckDuckGo search error: %s", e)
         return None
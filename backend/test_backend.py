@@ -9,10 +9,14 @@ Tests cover:
 - Model validation
 - API endpoint behavior
 """
+import re
 import pytest
-import hashlib
+import textwrap
 import json
+import httpx
+import xxhash
 from datetime import datetime, timezone
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 from typing import get_type_hints
 
@@ -22,15 +26,30 @@ from cache import CacheManager, cache_manager
 
 # ============== Fixtures ==============
 
+# Fixed timestamp for model fixtures; no test depends on it being current
+_NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Policy for the end-to-end flow, dedented once so no indentation is posted
+_FULL_FLOW_POLICY = textwrap.dedent("""
+    Privacy Policy
+
+    We collect personal information including your name, email, and browsing history.
+    This data may be shared with third-party advertisers.
+    We use cookies to track your activity across websites.
+    You can opt out of data collection by contacting us.
+    Data is retained for 5 years after account deletion.
+""").strip()
+
+
 @pytest.fixture
 def sample_policy_text():
     """Sample privacy policy text for testing."""
     return "This is a sample privacy policy that collects your data and shares it with third parties."
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_action_item():
-    """Sample ActionItem for testing."""
+    """Sample ActionItem for testing (built once per module; tests must not mutate it)."""
     return ActionItem(
         text="Review privacy settings",
         url="https://example.com/settings",
@@ -38,43 +57,39 @@ def sample_action_item():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_analysis_result(sample_action_item):
-    """Sample AnalysisResult for testing."""
+    """Sample AnalysisResult for testing (built once per module; tests must not mutate it)."""
     return AnalysisResult(
         score=75,
         summary="This is a test summary",
         red_flags=["Test flag 1", "Test flag 2"],
         user_action_items=[sample_action_item],
-        timestamp=datetime.now(timezone.utc),
+        timestamp=_NOW,
         url="https://example.com/privacy"
     )
 
 
-@pytest.fixture
+# Shape of a cache key: 16 lowercase hex characters
+_HEX16 = re.compile(r'[0-9a-f]{16}')
+
+# Raw shared/types.ts, read once at import; interface checks run on the bytes
+_TYPES_TS = (Path(__file__).parent / '..' / 'shared' / 'types.ts').read_bytes()
+
+
+@pytest.fixture(scope="session")
 def shared_types_schema():
     """Load the shared TypeScript types schema for validation.
 
     This fixture parses the shared/types.ts file to extract expected
     field names and types for cross-language type validation.
     """
-    import re
-    import os
-
-    types_file = os.path.join(os.path.dirname(__file__), '..', 'shared', 'types.ts')
-
-    with open(types_file, 'r') as f:
-        content = f.read()
-
-    # Extract interface definitions
+    # Extract interface definitions; only their presence is checked, so a
+    # plain substring test is enough
     interfaces = {}
 
     # Match ActionItem interface
-    action_item_match = re.search(
-        r'export interface ActionItem \{([^}]+)\}',
-        content, re.DOTALL
-    )
-    if action_item_match:
+    if b'export interface ActionItem {' in _TYPES_TS:
         interfaces['ActionItem'] = {
             'text': 'string',
             'url': 'string|undefined',
@@ -82,11 +97,7 @@ def shared_types_schema():
         }
 
     # Match AnalysisResult interface
-    analysis_result_match = re.search(
-        r'export interface AnalysisResult \{([^}]+)\}',
-        content, re.DOTALL
-    )
-    if analysis_result_match:
+    if b'export interface AnalysisResult {' in _TYPES_TS:
         interfaces['AnalysisResult'] = {
             'score': 'number',
             'summary': 'string',
@@ -97,22 +108,14 @@ def shared_types_schema():
         }
 
     # Match AnalyzeRequest interface
-    analyze_request_match = re.search(
-        r'export interface AnalyzeRequest \{([^}]+)\}',
-        content, re.DOTALL
-    )
-    if analyze_request_match:
+    if b'export interface AnalyzeRequest {' in _TYPES_TS:
         interfaces['AnalyzeRequest'] = {
             'policy_text': 'string',
             'url': 'string|undefined'
         }
 
     # Match HealthResponse interface
-    health_response_match = re.search(
-        r'export interface HealthResponse \{([^}]+)\}',
-        content, re.DOTALL
-    )
-    if health_response_match:
+    if b'export interface HealthResponse {' in _TYPES_TS:
         interfaces['HealthResponse'] = {
             'status': 'string',
             'timestamp': 'string',
@@ -124,15 +127,29 @@ def shared_types_schema():
 
 
 @pytest.fixture
-def isolated_cache(tmp_path):
-    """Create an isolated cache for testing."""
+def isolated_cache():
+    """Create an isolated, memory-only cache for testing (no log file is touched)."""
+    with patch.object(CacheManager, '_load_from_file', lambda self: None), \
+         patch.object(CacheManager, '_open_log', lambda self: None):
+        # Reset singleton for fresh instance
+        CacheManager._instance = None
+        manager = CacheManager()
+        yield manager
+        CacheManager._instance = None
+
+
+@pytest.fixture
+def persistent_cache(tmp_path):
+    """Create an isolated cache backed by a log file under tmp_path."""
     # Patch the cache file path
-    cache_file = tmp_path / "test_cache.json"
-    with patch('cache.CACHE_FILE', cache_file):
+    cache_file = tmp_path / "test_cache.log"
+    legacy_file = tmp_path / "test_cache.json"
+    with patch('cache.CACHE_FILE', cache_file), patch('cache.LEGACY_CACHE_FILE', legacy_file):
         # Reset singleton for fresh instance
         CacheManager._instance = None
         manager = CacheManager()
         yield manager
+        CacheManager._instance.close()
         CacheManager._instance = None
 
 
@@ -141,35 +158,211 @@ def isolated_cache(tmp_path):
 class TestCacheKeyGeneration:
     """Tests for cache key generation."""
 
-    def test_deterministic_hash(self, sample_policy_text):
-        """Same text should produce same hash."""
-        hash1 = cache_manager.generate_key(sample_policy_text)
-        hash2 = cache_manager.generate_key(sample_policy_text)
-        assert hash1 == hash2
-
-    def test_different_text_different_hash(self):
-        """Different text should produce different hash."""
-        hash1 = cache_manager.generate_key("Policy A")
-        hash2 = cache_manager.generate_key("Policy B")
-        assert hash1 != hash2
-
-    def test_case_insensitive(self):
-        """Hash should be case-insensitive."""
-        hash1 = cache_manager.generate_key("Privacy Policy")
-        hash2 = cache_manager.generate_key("PRIVACY POLICY")
-        assert hash1 == hash2
-
-    def test_whitespace_normalized(self):
-        """Hash should normalize whitespace."""
-        hash1 = cache_manager.generate_key("  Privacy Policy  ")
-        hash2 = cache_manager.generate_key("Privacy Policy")
-        assert hash1 == hash2
+    @pytest.mark.parametrize("text_a,text_b,expect_equal", [
+        ("Policy A", "Policy A", True),                # deterministic
+        ("Policy A", "Policy B", False),               # different text
+        ("Privacy Policy", "PRIVACY POLICY", True),    # case-insensitive
+        ("  Privacy Policy  ", "Privacy Policy", True),  # whitespace normalized
+    ])
+    def test_key_equivalences(self, text_a, text_b, expect_equal):
+        """Keys should match exactly when the normalized texts match."""
+        hash1 = cache_manager.generate_key(text_a)
+        hash2 = cache_manager.generate_key(text_b)
+        assert (hash1 == hash2) == expect_equal
+
+    def test_long_text_hashed_in_chunks(self):
+        """Chunked hashing should match hashing the whole normalized text."""
+        text = "  Privacy POLICY section. " * 10000
+        expected = xxhash.xxh3_64(text.strip().lower().encode('utf-8')).hexdigest()
+        assert cache_manager.generate_key(text) == expected
+
+    def test_chunk_boundary_does_not_change_lowercasing(self):
+        """A capital sigma just before a chunk boundary should lowercase as it does mid-word."""
+        from cache import HASH_CHUNK_CHARS
+        text = "x" * (HASH_CHUNK_CHARS - 1) + "ΣA"
+        expected = xxhash.xxh3_64(text.lower().encode('utf-8')).hexdigest()
+        assert cache_manager.generate_key(text) == expected
 
     def test_hash_length(self, sample_policy_text):
-        """SHA-256 hash should be 64 hex characters."""
+        """XXH3-64 hash should be 16 hex characters."""
         hash_key = cache_manager.generate_key(sample_policy_text)
-        assert len(hash_key) == 64
-        assert all(c in '0123456789abcdef' for c in hash_key)
+        assert len(hash_key) == 16
+        assert _HEX16.fullmatch(hash_key)
+
+    def test_blake2b_fallback(self):
+        """Without xxhash, keys should come from an 8-byte BLAKE2b digest."""
+        import hashlib
+        from functools import partial
+        with patch('cache._new_hasher', partial(hashlib.blake2b, digest_size=8, usedforsecurity=False)):
+            hash_key = cache_manager.generate_key("  Privacy POLICY  ")
+        assert hash_key == hashlib.blake2b(b"privacy policy", digest_size=8).hexdigest()
+        assert len(hash_key) == 16
+
+
+# ============== Cache Persistence Tests ==============
+
+class TestCachePersistence:
+    """Tests for cache file persistence."""
+
+    @staticmethod
+    def _reopen() -> CacheManager:
+        """Close the current cache singleton and load a fresh one from disk."""
+        CacheManager._instance.close()
+        CacheManager._instance = None
+        return CacheManager()
+
+    def test_set_and_get(self, isolated_cache, sample_analysis_result):
+        """Stored result should be returned on lookup."""
+        isolated_cache.set("abc", sample_analysis_result)
+        cached = isolated_cache.get("abc")
+        assert cached is not None
+        assert cached.score == sample_analysis_result.score
+        assert cached.red_flags == sample_analysis_result.red_flags
+
+    def test_reload_from_file(self, persistent_cache, sample_analysis_result):
+        """A fresh manager should load entries persisted by a previous one."""
+        persistent_cache.set("abc", sample_analysis_result)
+
+        reloaded = self._reopen()
+        assert reloaded.size() == 1
+        assert reloaded.get("abc").summary == sample_analysis_result.summary
+
+    def test_expired_entry_is_evicted(self, persistent_cache, sample_analysis_result):
+        """Expired entries should miss on lookup and be removed by the sweep."""
+        persistent_cache.set("abc", sample_analysis_result)
+        persistent_cache.set("def", sample_analysis_result)
+        persistent_cache._memory_cache["abc"]["expires_at"] = 0
+
+        assert persistent_cache.get("abc") is None
+        assert persistent_cache.evict_expired() == 1
+        assert persistent_cache.size() == 1
+
+        reloaded = self._reopen()
+        assert reloaded.get("abc") is None
+        assert reloaded.get("def") is not None
+
+    def test_eviction_keeps_entry_refreshed_mid_sweep(self, isolated_cache, sample_analysis_result):
+        """An entry re-set between the expiry scan and the locked pop should survive the sweep."""
+        isolated_cache.set("abc", sample_analysis_result)
+        isolated_cache._memory_cache["abc"]["expires_at"] = 0
+        lock = isolated_cache._write_lock
+
+        class RefreshFirst:
+            def __enter__(self):
+                # Runs after evict_expired() has collected "abc" as expired
+                isolated_cache._write_lock = lock
+                isolated_cache.set("abc", sample_analysis_result)
+                return lock.__enter__()
+
+            def __exit__(self, *exc):
+                return lock.__exit__(*exc)
+
+        isolated_cache._write_lock = RefreshFirst()
+        assert isolated_cache.evict_expired() == 0
+        assert isolated_cache.get("abc") is not None
+
+    def test_lru_eviction(self, isolated_cache, sample_analysis_result):
+        """Least-recently-used entries should be evicted beyond the size bound."""
+        with patch('cache.CACHE_MAX_ENTRIES', 2):
+            isolated_cache.set("a", sample_analysis_result)
+            isolated_cache.set("b", sample_analysis_result)
+            assert isolated_cache.get("a") is not None
+            isolated_cache.set("c", sample_analysis_result)
+
+            assert isolated_cache.size() == 2
+            assert isolated_cache.get("b") is None
+            assert isolated_cache.get("a") is not None
+            assert isolated_cache.get("c") is not None
+
+    def test_clear_survives_reload(self, persistent_cache, sample_analysis_result):
+        """Cleared entries should not come back from the log."""
+        persistent_cache.set("abc", sample_analysis_result)
+        persistent_cache.clear()
+
+        assert self._reopen().size() == 0
+
+    def test_torn_tail_is_ignored(self, persistent_cache, sample_analysis_result, tmp_path):
+        """A partially written trailing record should be dropped on load."""
+        persistent_cache.set("abc", sample_analysis_result)
+        persistent_cache.close()
+        with open(tmp_path / "test_cache.log", 'ab') as f:
+            f.write(b'\x00\x00\x01\x00partial')
+
+        reloaded = self._reopen()
+        assert reloaded.size() == 1
+        reloaded.set("def", sample_analysis_result)
+
+        assert self._reopen().size() == 2
+
+    @pytest.mark.parametrize("record", [
+        {"v": None},                          # no key
+        {"k": "def", "v": "not an entry"},    # value is not an entry map
+        {"k": "def", "v": {"expires_at": 0}},  # entry missing its result
+    ])
+    def test_malformed_record_is_ignored(self, persistent_cache, sample_analysis_result, tmp_path, record):
+        """A well-formed MessagePack record with the wrong shape should end replay like a torn tail."""
+        import msgspec
+        persistent_cache.set("abc", sample_analysis_result)
+        persistent_cache.close()
+        buf = msgspec.msgpack.encode(record)
+        with open(tmp_path / "test_cache.log", 'ab') as f:
+            f.write(len(buf).to_bytes(4, 'big') + buf)
+
+        reloaded = self._reopen()
+        assert reloaded.size() == 1
+        reloaded.set("def", sample_analysis_result)
+
+        assert self._reopen().get("def") is not None
+
+    def test_periodic_fsync(self, persistent_cache, sample_analysis_result):
+        """The log should be fsynced once every FSYNC_EVERY_WRITES appends."""
+        with patch('cache.FSYNC_EVERY_WRITES', 3), patch('cache.os.fsync') as mock_fsync:
+            for i in range(7):
+                persistent_cache.set(f"key{i}", sample_analysis_result)
+        assert mock_fsync.call_count == 2
+
+    def test_log_is_compacted(self, persistent_cache, sample_analysis_result, tmp_path):
+        """Rewriting the same key repeatedly should not grow the log unbounded."""
+        for _ in range(200):
+            persistent_cache.set("abc", sample_analysis_result)
+
+        single_record = len(CacheManager._frame("abc", persistent_cache._memory_cache["abc"]))
+        assert (tmp_path / "test_cache.log").stat().st_size < 100 * single_record
+
+    def test_legacy_json_discarded(self, tmp_path, sample_analysis_result):
+        """Legacy cache.json (SHA-256 keys) should be removed rather than imported."""
+        cache_file = tmp_path / "test_cache.log"
+        legacy_file = tmp_path / "test_cache.json"
+        legacy_file.write_text(json.dumps({
+            "a" * 64: {
+                "result": sample_analysis_result.model_dump(mode='json'),
+                "timestamp": _NOW.isoformat(),
+                "text_hash": "a" * 64
+            }
+        }))
+
+        with patch('cache.CACHE_FILE', cache_file), patch('cache.LEGACY_CACHE_FILE', legacy_file):
+            CacheManager._instance = None
+            manager = CacheManager()
+            assert manager.size() == 0
+            assert not legacy_file.exists()
+            manager.close()
+            CacheManager._instance = None
+
+    def test_log_from_other_version_discarded(self, persistent_cache, sample_analysis_result, tmp_path):
+        """A log written under a different CACHE_VERSION should not be replayed."""
+        persistent_cache.set("abc", sample_analysis_result)
+        persistent_cache.close()
+        log_file = tmp_path / "test_cache.log"
+        current_header = log_file.read_bytes()[:6]
+        log_file.write_bytes(current_header[:4] + b'\x00\x01' + log_file.read_bytes()[6:])
+
+        reloaded = self._reopen()
+        assert reloaded.size() == 0
+        reloaded.set("def", sample_analysis_result)
+
+        assert log_file.read_bytes().startswith(current_header)
+        assert self._reopen().get("def") is not None
 
 
 # ============== Model Tests ==============
@@ -207,7 +400,7 @@ class TestModels:
                 summary="Test",
                 red_flags=[],
                 user_action_items=[],
-                timestamp=datetime.now(timezone.utc),
+                timestamp=_NOW,
                 url=""
             )
 
@@ -217,7 +410,7 @@ class TestModels:
                 summary="Test",
                 red_flags=[],
                 user_action_items=[],
-                timestamp=datetime.now(timezone.utc),
+                timestamp=_NOW,
                 url=""
             )
 
@@ -227,15 +420,6 @@ class TestModels:
 class TestAPIEndpoints:
     """Tests for FastAPI endpoints."""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        from fastapi.testclient import TestClient
-        from main import app
-        client = TestClient(app)
-        yield client
-        client.close()
-
     def test_health_endpoint(self, client):
         """Health endpoint should return status."""
         response = client.get("/health")
@@ -245,6 +429,13 @@ class TestAPIEndpoints:
         assert "timestamp" in data
         assert "cache_size" in data
 
+    def test_health_timestamp_is_iso8601(self, client):
+        """Health timestamp should be a timezone-aware ISO 8601 string."""
+        data = client.get("/health").json()
+        parsed = datetime.fromisoformat(data["timestamp"])
+        assert parsed.tzinfo is not None
+        assert abs((datetime.now(timezone.utc) - parsed).total_seconds()) < 5
+
     def test_analyze_empty_text_no_url(self, client):
         """Analyze should reject empty policy text if no URL is provided."""
         response = client.post("/analyze", json={
@@ -262,30 +453,122 @@ class TestAPIEndpoints:
         assert response.status_code == 400  # Application error (missing text and url)
 
     @patch('service_llm.LLMService.analyze_policy')
-    @patch('requests.get')
-    def test_analyze_fetch_url_success(self, mock_get, mock_analyze, client, sample_analysis_result):
+    def test_analyze_fetch_url_success(self, mock_analyze, client, sample_analysis_result):
         """Analyze should fetch content from URL if policy_text is empty."""
         # Mock successful fetch
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.text = "<html><body>Fetched Privacy Policy Content</body></html>"
-        mock_get.return_value = mock_response
+        requested = []
+
+        def handler(request):
+            requested.append(request)
+            return httpx.Response(200, text="<html><body>Fetched Privacy Policy Content</body></html>")
+
+        fetch_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
 
         # Mock LLM analysis
         mock_analyze.return_value = sample_analysis_result
 
-        response = client.post("/analyze", json={
-            "policy_text": "",
-            "url": "https://example.com/fetched-policy"
-        })
-        
+        with patch('main.http_client', fetch_client):
+            response = client.post("/analyze", json={
+                "policy_text": "",
+                "url": "https://example.com/fetched-policy"
+            })
+
         # Should now process this as valid policy text
         assert response.status_code == 200
         data = response.json()
         assert "score" in data
-        
+
         # Verify it tried to fetch
-        mock_get.assert_called_with("https://example.com/fetched-policy", headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+        assert [str(r.url) for r in requested] == ["https://example.com/fetched-policy"]
+
+    def test_analyze_request_strips_null_bytes(self):
+        """Null bytes should be removed from policy text and URL."""
+        from main import AnalyzeRequest
+
+        request = AnalyzeRequest(policy_text="Pri\x00vacy", url=" https://exa\x00mple.com ")
+        assert request.policy_text == "Privacy"
+        assert request.url == "https://example.com"
+
+    def test_analyze_request_truncates_long_text(self):
+        """Oversized policy text should be truncated by the request model."""
+        from main import AnalyzeRequest, MAX_POLICY_CHARS
+
+        request = AnalyzeRequest(policy_text="a" * (MAX_POLICY_CHARS + 10))
+        assert len(request.policy_text) == MAX_POLICY_CHARS
+
+    def test_read_capped_stops_at_limit(self):
+        """Streamed fetches should stop reading once the byte cap is reached."""
+        import asyncio
+        from main import _read_capped
+
+        async def fetch():
+            transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"x" * 10_000))
+            async with httpx.AsyncClient(transport=transport) as fetch_client:
+                async with fetch_client.stream("GET", "https://example.com") as resp:
+                    return await _read_capped(resp, 1_000)
+
+        assert len(asyncio.run(fetch())) == 1_000
+
+    @patch('service_llm.LLMService.analyze_policy')
+    def test_concurrent_misses_share_one_llm_call(self, mock_analyze, app, sample_analysis_result):
+        """Identical policies analyzed concurrently should trigger a single LLM call."""
+        import asyncio
+        import time
+
+        def slow_analysis(policy_text, url):
+            time.sleep(0.2)
+            return sample_analysis_result
+
+        mock_analyze.side_effect = slow_analysis
+        payload = {"policy_text": "Singleflight policy text", "url": ""}
+
+        async def post_concurrently():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(async_client.post("/analyze", json=payload) for _ in range(3)))
+
+        responses = asyncio.run(post_concurrently())
+
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert mock_analyze.call_count == 1
+
+    @patch('service_llm.LLMService.analyze_policy')
+    def test_cancelled_leader_does_not_fail_joiner(self, mock_analyze, app, sample_analysis_result):
+        """A joiner should still get the shared result when the request that started it is cancelled."""
+        import asyncio
+        import threading
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_analysis(policy_text, url):
+            started.set()
+            release.wait(5)
+            return sample_analysis_result
+
+        mock_analyze.side_effect = blocking_analysis
+        payload = {"policy_text": "Cancelled leader policy text", "url": ""}
+
+        async def cancel_leader():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                leader = asyncio.create_task(async_client.post("/analyze", json=payload))
+                while not started.is_set():
+                    await asyncio.sleep(0.01)
+                joiner = asyncio.create_task(async_client.post("/analyze", json=payload))
+                await asyncio.sleep(0.05)
+
+                leader.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await leader
+                release.set()
+                return await joiner
+
+        response = asyncio.run(cancel_leader())
+
+        assert response.status_code == 200
+        assert response.json()["summary"] == sample_analysis_result.summary
+        assert mock_analyze.call_count == 1
 
     def test_analyze_valid_request(self, client, sample_policy_text):
         """Analyze should process valid policy text."""
@@ -313,32 +596,89 @@ class TestAPIEndpoints:
 class TestLLMService:
     """Tests for LLM service."""
 
-    def test_mock_analysis_generation(self, sample_policy_text):
+    def test_mock_analysis_generation(self, llm_service, sample_policy_text):
         """Mock analysis should generate valid result."""
-        from service_llm import LLMService
-        service = LLMService()
-
-        # Force test mode
-        service.test_mode = True
-        result = service.analyze_policy(sample_policy_text, "https://example.com")
+        result = llm_service.analyze_policy(sample_policy_text, "https://example.com")
 
         assert isinstance(result, AnalysisResult)
         assert 0 <= result.score <= 100
         assert len(result.summary) > 0
 
-    def test_mock_analysis_concerning_keywords(self):
+    def test_mock_analysis_concerning_keywords(self, llm_service):
         """Mock analysis should detect concerning keywords."""
-        from service_llm import LLMService
-        service = LLMService()
-        service.test_mode = True
-
         concerning_text = "We sell your data to third parties and retain it indefinitely. We track you across websites."
-        result = service.analyze_policy(concerning_text, "")
+        result = llm_service.analyze_policy(concerning_text, "")
 
         # Should have lower score due to concerning keywords
         assert result.score <= 70
         assert len(result.red_flags) > 0
 
+    def test_mock_analysis_overlapping_keywords(self, llm_service):
+        """Keywords nested inside longer ones should still be counted."""
+        # "never share" is positive (+3) and contains the concerning "share" (-5);
+        # a short text adds the +10 length bonus
+        result = llm_service.analyze_policy("We never share anything.", "")
+
+        assert result.score == 70 - 5 + 3 + 10
+
+    def test_long_policy_truncated_in_prompt(self):
+        """Policy text over 50,000 chars should be cut and marked in the user message."""
+        from service_llm import LLMService
+        service = LLMService()
+        service.test_mode = False
+        service.provider = "groq"
+        service.client = MagicMock()
+        service.client.chat.completions.create.return_value.choices[0].message.content = json.dumps({
+            "score": 50, "summary": "ok", "red_flags": [], "user_action_items": []
+        })
+
+        service.analyze_policy("a" * 60000, "https://example.com")
+
+        messages = service.client.chat.completions.create.call_args.kwargs["messages"]
+        user_message = messages[1]["content"]
+        assert user_message == (
+            "Analyze this privacy policy:\n\n" + "a" * 50000
+            + "\n[Text truncated at 50,000 characters]"
+        )
+
+    def test_invalid_llm_json_raises(self):
+        """A non-JSON provider response should surface as a parse failure."""
+        from service_llm import LLMService
+        service = LLMService()
+        service.test_mode = False
+        service.provider = "groq"
+        service.client = MagicMock()
+        service.client.chat.completions.create.return_value.choices[0].message.content = "not json"
+
+        with pytest.raises(Exception, match="Failed to parse LLM response"):
+            service.analyze_policy("Some policy", "https://example.com")
+
+    def test_validate_response_requires_all_fields(self, llm_service):
+        """Responses missing any required field should be rejected."""
+        full = {"score": 50, "summary": "ok", "red_flags": [], "user_action_items": []}
+        assert llm_service._validate_response(full)
+        assert llm_service._validate_response({**full, "extra": True})
+        assert not llm_service._validate_response({"score": 50, "summary": "ok", "red_flags": []})
+
+    def test_system_prompt_is_stable_prefix(self):
+        """The system prompt should lead every request unchanged so provider prefix caches hit."""
+        from service_llm import LLMService, SYSTEM_PROMPT
+        service = LLMService()
+        service.test_mode = False
+        service.provider = "azure"
+        service.client = MagicMock()
+        service.client.chat.completions.create.return_value.choices[0].message.content = json.dumps({
+            "score": 50, "summary": "ok", "red_flags": [], "user_action_items": []
+        })
+
+        service.analyze_policy("First policy", "https://a.example.com")
+        service.analyze_policy("Second policy", "https://b.example.com")
+
+        for call in service.client.chat.completions.create.call_args_list:
+            first = call.kwargs["messages"][0]
+            assert first["role"] == "system"
+            assert first["content"] is SYSTEM_PROMPT
+
 
 # ============== Type Contract Tests ==============
 
@@ -389,7 +729,7 @@ class TestTypeContract:
                 summary="Test",
                 red_flags=[],
                 user_action_items=[],
-                timestamp=datetime.now(timezone.utc),
+                timestamp=_NOW,
                 url=""
             )
             assert result.score == score
@@ -402,62 +742,64 @@ class TestTypeContract:
             item = ActionItem(text="Test", priority=priority)
             assert item.priority == priority
 
-    def test_api_response_matches_typescript_interface(self, sample_policy_text):
-        """API response structure should match AnalysisResult interface."""
-        from fastapi.testclient import TestClient
-        from main import app
+    @pytest.fixture
+    def stub_llm(self, app, sample_analysis_result):
+        """Answer cache misses with a canned result instead of running the analysis."""
+        from main import get_llm_service
 
-        client = TestClient(app)
-        try:
-            response = client.post("/analyze", json={
-                "policy_text": sample_policy_text,
-                "url": "https://example.com"
-            })
+        class StubLLM:
+            provider = "stub"
 
-            assert response.status_code == 200
-            data = response.json()
-
-            # Validate all TypeScript interface fields exist
-            assert 'score' in data
-            assert 'summary' in data
-            assert 'red_flags' in data
-            assert 'user_action_items' in data
-            assert 'timestamp' in data
-            assert 'url' in data
-
-            # Validate types
-            assert isinstance(data['score'], int)
-            assert 0 <= data['score'] <= 100
-            assert isinstance(data['summary'], str)
-            assert isinstance(data['red_flags'], list)
-            assert all(isinstance(f, str) for f in data['red_flags'])
-            assert isinstance(data['user_action_items'], list)
-
-            # Validate action items structure
-            for item in data['user_action_items']:
-                assert 'text' in item
-                assert 'priority' in item
-                assert item['priority'] in ['high', 'medium', 'low']
-        finally:
-            client.close()
-
-    def test_health_response_matches_typescript(self):
-        """Health endpoint should match HealthResponse interface."""
-        from fastapi.testclient import TestClient
-        from main import app
+            async def analyze_policy_async(self, policy_text, url):
+                return sample_analysis_result
 
-        client = TestClient(app)
-        try:
-            response = client.get("/health")
-            data = response.json()
+        app.dependency_overrides[get_llm_service] = StubLLM
+        yield
+        app.dependency_overrides.pop(get_llm_service, None)
 
-            # Validate TypeScript HealthResponse fields
-            assert data['status'] in ['healthy', 'unhealthy']
-            assert isinstance(data['timestamp'], str)
-            assert isinstance(data['cache_size'], int)
-            assert isinstance(data['test_mode'], bool)
-        finally:
-            client.close()
+    def test_api_response_matches_typescript_interface(self, client, stub_llm, sample_analysis_result):
+        """API response structure should match AnalysisResult interface."""
+        response = client.post("/analyze", json={
+            "policy_text": "Contract test policy",
+            "url": "https://example.com"
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data['summary'] == sample_analysis_result.summary
+
+        # Validate all TypeScript interface fields exist
+        assert 'score' in data
+        assert 'summary' in data
+        assert 'red_flags' in data
+        assert 'user_action_items' in data
+        assert 'timestamp' in data
+        assert 'url' in data
+
+        # Validate types
+        assert isinstance(data['score'], int)
+        assert 0 <= data['score'] <= 100
+        assert isinstance(data['summary'], str)
+        assert isinstance(data['red_flags'], list)
+        assert all(isinstance(f, str) for f in data['red_flags'])
+        assert isinstance(data['user_action_items'], list)
+
+        # Validate action items structure
+        for item in data['user_action_items']:
+            assert 'text' in item
+            assert 'priority' in item
+            assert item['priority'] in ['high', 'medium', 'low']
+
+    def test_health_response_matches_typescript(self, client):
+        """Health endpoint should match HealthResponse interface."""
+        response = client.get("/health")
+        data = response.json()
+
+        # Validate TypeScript HealthResponse fields
+        assert data['status'] in ['healthy', 'unhealthy']
+        assert isinstance(data['timestamp'], str)
+        assert isinstance(data['cache_size'], int)
+        assert isinstance(data['test_mode'], bool)
 
 
 # ============== Integration Tests ==============
@@ -465,29 +807,10 @@ class TestTypeContract:
 class TestIntegration:
     """End-to-end integration tests."""
 
-    @pytest.fixture
-    def client(self):
-        """Create test client."""
-        from fastapi.testclient import TestClient
-        from main import app
-        client = TestClient(app)
-        yield client
-        client.close()
-
     def test_full_analysis_flow(self, client):
         """Test complete analysis flow from request to response."""
-        policy_text = """
-        Privacy Policy
-
-        We collect personal information including your name, email, and browsing history.
-        This data may be shared with third-party advertisers.
-        We use cookies to track your activity across websites.
-        You can opt out of data collection by contacting us.
-        Data is retained for 5 years after account deletion.
-        """
-
         response = client.post("/analyze", json={
-            "policy_text": policy_text,
+            "policy_text": _FULL_FLOW_POLICY,
             "url": "https://example.com/privacy"
         })
 
@@ -500,14 +823,36 @@ class TestIntegration:
         # Should have action items
         assert 'user_action_items' in result
 
+    def test_independent_analyses_run_concurrently(self, app):
+        """Independent /analyze requests fired together should all succeed with their own results."""
+        import asyncio
+
+        payloads = [
+            {"policy_text": "We never sell your data.", "url": "https://a.example.com"},
+            {"policy_text": "We share data with third parties indefinitely."},
+            {"policy_text": "You can delete your account under GDPR.", "url": ""},
+        ]
+
+        async def post_all():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(async_client.post("/analyze", json=p) for p in payloads))
+
+        responses = asyncio.run(post_all())
+
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert [r.json()["url"] for r in responses] == ["https://a.example.com", "", ""]
+        # The concerning-only policy scores lowest
+        scores = [r.json()["score"] for r in responses]
+        assert scores[1] == min(scores)
+
     def test_cache_hit_returns_same_result(self, client, sample_policy_text):
         """Same policy text should return cached result."""
-        # First request
-        response1 = client.post("/analyze", json={
+        # First request populates this test's fresh cache
+        result1 = client.post("/analyze", json={
             "policy_text": sample_policy_text,
             "url": "https://example.com"
-        })
-        result1 = response1.json()
+        }).json()
 
         # Second request with same text
         response2 = client.post("/analyze", json={
@@ -519,6 +864,7 @@ class TestIntegration:
         # Results should be identical (from cache)
         assert result1['score'] == result2['score']
         assert result1['summary'] == result2['summary']
+        assert result1['timestamp'] == result2['timestamp']
 
 
 if __name__ == "__main__":
@@ -1,22 +1,31 @@
+import asyncio
 import pytest
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 from service_discovery import DiscoveryService
 
-@pytest.fixture
-def discovery_service():
+@pytest.fixture(scope="module")
+def shared_discovery_service():
+    # One service (session, thread pool) for the whole module; all network calls are mocked
     return DiscoveryService()
 
+@pytest.fixture
+def discovery_service(shared_discovery_service):
+    # Start every test with an empty policy cache so results cannot leak between tests
+    shared_discovery_service._policy_cache.clear()
+    return shared_discovery_service
+
 def test_get_domain(discovery_service):
     assert discovery_service._get_domain("https://example.com/foo") == "example.com"
     assert discovery_service._get_domain("http://sub.test.co.uk") == "sub.test.co.uk"
     assert discovery_service._get_domain("example.com") == "example.com"
 
-@patch('requests.get')
-def test_soft_discovery_homepage_link(mock_get, discovery_service):
+def test_soft_discovery_homepage_link(discovery_service):
     # Mock homepage response with a privacy link
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.text = """
+    mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    mock_response.iter_content.return_value = [b"""
     <html>
         <body>
             <footer>
@@ -24,44 +33,96 @@ def test_soft_discovery_homepage_link(mock_get, discovery_service):
             </footer>
         </body>
     </html>
-    """
-    mock_get.return_value = mock_response
-
-    url = discovery_service._soft_discovery("https://example.com")
+    """]
+    with patch.object(discovery_service.session, 'get', return_value=mock_response):
+        url = discovery_service._soft_discovery("https://example.com")
     assert url == "https://example.com/privacy-policy"
+    mock_response.close.assert_called_once()
+
+def test_homepage_link_match_ignores_case(discovery_service):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    mock_response.iter_content.return_value = [
+        b'<html><body><a href="/about">About</a><a href="/p/123">PRIVACY NOTICE</a></body></html>'
+    ]
+    with patch.object(discovery_service.session, 'get', return_value=mock_response):
+        url = discovery_service._scan_homepage("https://example.com")
+    assert url == "https://example.com/p/123"
+
+def test_homepage_scan_skips_non_html(discovery_service):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'application/json'}
+    with patch.object(discovery_service.session, 'get', return_value=mock_response):
+        assert discovery_service._scan_homepage("https://example.com") is None
+    mock_response.iter_content.assert_not_called()
+    mock_response.close.assert_called_once()
+
+def test_homepage_scan_stops_at_first_match(discovery_service):
+    consumed = []
 
-@patch('requests.get')
-@patch('requests.head')
-def test_soft_discovery_standard_path(mock_head, mock_get, discovery_service):
+    def chunks():
+        for chunk in (b'<html><body><a href="/about">About</a>',
+                      b'<a href="/legal/privacy">Privacy</a><p>more',
+                      b'</p><a href="/tos">Terms</a></body></html>'):
+            consumed.append(chunk)
+            yield chunk
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+    mock_response.iter_content.return_value = chunks()
+    with patch.object(discovery_service.session, 'get', return_value=mock_response):
+        url = discovery_service._scan_homepage("https://example.com")
+    assert url == "https://example.com/legal/privacy"
+    # The tail of the page is never downloaded
+    assert len(consumed) == 2
+
+def test_soft_discovery_standard_path(discovery_service):
     # Mock homepage with no links
-    mock_get.return_value.status_code = 200
-    mock_get.return_value.text = "<html><body>No links here</body></html>"
+    mock_home = MagicMock()
+    mock_home.status_code = 200
+    mock_home.headers = {'Content-Type': 'text/html'}
+    mock_home.iter_content.return_value = [b"<html><body>No links here</body></html>"]
     
-    # Mock HEAD request to find /privacy
+    # Mock HEAD request to find /privacy; responses are built once and shared
+    ok = SimpleNamespace(status_code=200)
+    not_found = SimpleNamespace(status_code=404)
+
     def side_effect(url, **kwargs):
-        resp = MagicMock()
-        if url.endswith("/privacy"):
-            resp.status_code = 200
-        else:
-            resp.status_code = 404
-        return resp
-        
-    mock_head.side_effect = side_effect
-
-    url = discovery_service._soft_discovery("https://example.com")
-    assert url == "https://example.com/privacy"
+        return ok if url.endswith("/privacy") else not_found
 
-@patch('service_discovery.DDGS')
-def test_ddg_search(mock_ddgs_cls, discovery_service):
-    # Mock DDG results
-    mock_ddgs_instance = mock_ddgs_cls.return_value
-    mock_ddgs_instance.__enter__.return_value = mock_ddgs_instance
-    mock_ddgs_instance.text.return_value = [
-        {'href': 'https://example.com/generated-policy', 'title': 'Privacy Policy'}
-    ]
+    with patch.object(discovery_service.session, 'get', return_value=mock_home), \
+            patch.object(discovery_service.session, 'head', side_effect=side_effect):
+        url = discovery_service._soft_discovery("https://example.com")
+    assert url == "https://example.com/privacy"
 
-    url = discovery_service._search_ddg("example.com")
+def test_ddg_search(discovery_service):
+    # Mock DDG HTML results page; result links go through a redirect
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.text = """
+    <html><body>
+        <div class="result">
+            <a class="result__a" href="//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fgenerated-policy&amp;rut=abc">Privacy Policy</a>
+        </div>
+        <div class="result">
+            <a class="result__a" href="https://example.com/other">Other</a>
+        </div>
+    </body></html>
+    """
+    with patch.object(discovery_service.session, 'get', return_value=mock_response) as mock_get:
+        url = discovery_service._search_ddg("example.com")
     assert url == "https://example.com/generated-policy"
+    assert mock_get.call_args.kwargs['params'] == {'q': 'site:example.com privacy policy'}
+
+def test_ddg_search_no_results(discovery_service):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.text = "<html><body><div class='no-results'>No results.</div></body></html>"
+    with patch.object(discovery_service.session, 'get', return_value=mock_response):
+        assert discovery_service._search_ddg("example.com") is None
 
 @patch('service_discovery.DiscoveryService._soft_discovery')
 @patch('service_discovery.DiscoveryService._search_ddg')
@@ -73,5 +134,86 @@ def test_find_policy_flow(mock_search, mock_soft, discovery_service):
 
     # Test soft failure, ddg success
     mock_soft.return_value = None
+    mock_search.return_value = "https://example.org/ddg"
+    assert discovery_service.find_policy("https://example.org") == "https://example.org/ddg"
+
+@patch('service_discovery.DiscoveryService._soft_discovery')
+@patch('service_discovery.DiscoveryService._search_ddg')
+def test_find_policy_cached_per_domain(mock_search, mock_soft, discovery_service):
+    mock_soft.return_value = "https://example.com/privacy"
+    assert discovery_service.find_policy("https://example.com/a") == "https://example.com/privacy"
+    assert discovery_service.find_policy("https://example.com/b") == "https://example.com/privacy"
+    mock_soft.assert_called_once()
+
+    # Misses are not cached, so a later attempt retries discovery
+    mock_soft.return_value = None
+    mock_search.return_value = None
+    assert discovery_service.find_policy("https://missing.example") is None
+    assert discovery_service.find_policy("https://missing.example") is None
+    assert mock_search.call_count == 2
+
+@patch('service_discovery.DiscoveryService._search_ddg')
+@patch('service_discovery.DiscoveryService._soft_discovery')
+def test_find_policy_async(mock_soft, mock_search, discovery_service):
+    mock_soft.return_value = "https://example.com/soft"
     mock_search.return_value = "https://example.com/ddg"
-    assert discovery_service.find_policy("https://example.com") == "https://example.com/ddg"
+    url = asyncio.run(discovery_service.find_policy_async("https://example.com"))
+    # Soft discovery takes precedence even though DDG was started alongside it
+    assert url == "https://example.com/soft"
+
+@patch('service_discovery.DiscoveryService._search_ddg')
+@patch('service_discovery.DiscoveryService._soft_discovery')
+def test_find_policy_async_falls_back_to_ddg(mock_soft, mock_search, discovery_service):
+    mock_soft.return_value = None
+    mock_search.return_value = "https://example.net/ddg"
+    url = asyncio.run(discovery_service.find_policy_async("https://example.net"))
+    assert url == "https://example.net/ddg"
+    mock_soft.assert_called_once_with("https://example.net")
+    mock_search.assert_called_once_with("example.net")
+
+@patch('service_discovery.DiscoveryService._search_ddg')
+@patch('service_discovery.DiscoveryService._soft_discovery')
+def test_sync_and_async_share_policy_cache(mock_soft, mock_search, discovery_service):
+    mock_soft.return_value = None
+    mock_search.return_value = "https://example.net/ddg"
+    assert asyncio.run(discovery_service.find_policy_async("https://example.net/a")) == "https://example.net/ddg"
+    assert discovery_service.find_policy("https://example.net/b") == "https://example.net/ddg"
+    mock_search.assert_called_once()
+
+def test_homepage_scan_respects_byte_cap(discovery_service):
+    consumed = []
+
+    def chunks():
+        for i in range(10):
+            chunk = b'<p>' + b'x' * 1000 + b'</p>'
+            consumed.append(chunk)
+            yield chunk
+        yield b'<a href="/privacy">Privacy</a>'
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = {'Content-Type': 'text/html'}
+    mock_response.iter_content.return_value = chunks()
+    with patch('service_discovery.MAX_HOMEPAGE_BYTES', 3000), \
+         patch.object(discovery_service.session, 'get', return_value=mock_response):
+        assert discovery_service._scan_homepage("https://example.com") is None
+    assert len(consumed) == 3
+
+def test_concurrent_discoveries_probe_in_parallel(discovery_service):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Every probe of both discoveries must be in flight at once to pass the barrier
+    barrier = threading.Barrier(2 * len(discovery_service.common_paths), timeout=2)
+    ok = SimpleNamespace(status_code=200)
+
+    def head(url, **kwargs):
+        barrier.wait()
+        return ok
+
+    with patch.object(discovery_service, '_scan_homepage', return_value=None), \
+            patch.object(discovery_service.session, 'head', side_effect=head), \
+            ThreadPoolExecutor(max_workers=2) as callers:
+        results = list(callers.map(discovery_service._soft_discovery,
+                                   ["https://a.example", "https://b.example"]))
+    assert results == ["https://a.example/privacy", "https://b.example/privacy"]
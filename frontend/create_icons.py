@@ -1,17 +1,25 @@
 """Generate placeholder icon files for the extension"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 
-def create_icon(size, filename):
+@lru_cache(maxsize=None)
+def _font(size):
+    # Load each font size once; fall back to PIL's built-in font if Arial is missing
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+def build_master(size=128):
     # Create a blue square with white text
     img = Image.new('RGB', (size, size), color='#3b82f6')
     draw = ImageDraw.Draw(img)
 
     # Add "PP" text (Privacy Policy)
-    try:
-        font_size = size // 2
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except:
-        font = ImageFont.load_default()
+    font = _font(size // 2)
 
     text = "PP"
     # Get text bounding box
@@ -24,13 +32,42 @@ def create_icon(size, filename):
     y = (size - text_height) // 2
 
     draw.text((x, y), text, fill='white', font=font)
+    return img
+
+def save_icon(item):
+    img, filename = item
+    # Tiny placeholder icons: favour fast encoding over the last few bytes
+    img.save(filename, optimize=False, compress_level=1)
+    return filename
+
+def is_fresh(filename, src_mtime):
+    # Outputs written after the last edit to this script are up to date
+    return os.path.exists(filename) and os.path.getmtime(filename) >= src_mtime
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--force', action='store_true', help='regenerate icons even if they are up to date')
+args = parser.parse_args()
+
+src_mtime = os.path.getmtime(__file__)
+sizes = []
+for size in (128, 48, 32, 16):
+    filename = f'extension/public/icons/icon{size}.png'
+    if not args.force and is_fresh(filename, src_mtime):
+        print(f"Skipped {filename} (up to date)")
+    else:
+        sizes.append((size, filename))
 
-    img.save(filename)
-    print(f"Created {filename}")
+if sizes:
+    # Draw the largest icon once and downscale it for the smaller sizes
+    master = build_master(128)
+    icons = [
+        (master if size == 128 else master.resize((size, size), Image.LANCZOS), filename)
+        for size, filename in sizes
+    ]
 
-# Create icons in different sizes
-sizes = [16, 32, 48, 128]
-for size in sizes:
-    create_icon(size, f'extension/public/icons/icon{size}.png')
+    # PNG encoding releases the GIL, so the writes overlap
+    with ThreadPoolExecutor(max_workers=len(icons)) as executor:
+        for filename in executor.map(save_icon, icons):
+            print(f"Created {filename}")
 
 print("All icons created successfully!")